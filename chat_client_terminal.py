@@ -4,32 +4,60 @@ Cliente de Chat Multi-sala com criptografia SSL/TLS.
 Este módulo implementa um cliente de chat seguro que se conecta ao servidor de chat multi-sala.
 Funcionalidades:
 - Comunicação criptografada com SSL/TLS
-- Recebimento e envio de mensagens em tempo real
-- Interface de usuário baseada em terminal
-- Gerenciamento automático de conexão e handshake SSL
+- E/S assíncrona com asyncio (recebimento e envio concorrentes)
+- Decodificação UTF-8 incremental (caracteres divididos entre leituras não quebram o cliente)
+- Exibição agrupada no terminal para acompanhar salas movimentadas
+- Reconexão automática com espera exponencial
+- Modo roteirizado não interativo para testes de carga prolongados
+- Compressão das mensagens do servidor, negociada no handshake TLS
 """
 
-import socket
-import threading
-import sys
-import os
+import argparse
+import asyncio
+import codecs
+import random
 import ssl
+import sys
+import threading
+import time
+import zlib
+
+import compression
 
 # Configuração de conexão com o servidor
-HOST = "0.tcp.sa.ngrok.io"  # Hostname do túnel ngrok para acesso remoto
-PORT = int(sys.argv[1])     # Porta dinâmica do túnel ngrok
-# HOST = '127.0.0.1'        # Localhost para testes locais
-# PORT = 12345              # Porta local padrão
+DEFAULT_HOST = "0.tcp.sa.ngrok.io"  # Hostname do túnel ngrok para acesso remoto
+DEFAULT_PORT = 12345                # Porta local padrão
+# Para testes locais: python chat_client_terminal.py 12345 --host 127.0.0.1
 ENCODING = "utf-8"
 
+READ_CHUNK = 65536               # Tamanho máximo de cada leitura do socket
+FLUSH_INTERVAL = 0.05            # Intervalo (s) entre escritas agrupadas no terminal
+FLUSH_MAX_BUFFER = 64 * 1024     # Força a escrita quando o buffer atinge este tamanho
+RECONNECT_INITIAL_DELAY = 1.0    # Espera inicial (s) antes de reconectar
+RECONNECT_MAX_DELAY = 30.0       # Espera máxima (s) entre tentativas de reconexão
+STABLE_SESSION = 10.0            # Sessões mais longas que isto (s) zeram a contagem de falhas
+# Última mensagem do servidor quando o usuário escolhe "Sair (Desconectar)"
+GOODBYE_MESSAGE = "*** Desconectado. Até logo! ***"
+
+# Protocolos ALPN oferecidos ao servidor para cada opção de --compress
+COMPRESSION_OFFERS = {
+    "auto": compression.ALPN_PROTOCOLS,
+    "zlib-dict": [compression.PROTOCOL_DEFLATE_DICT, compression.PROTOCOL_PLAIN],
+    "zlib": [compression.PROTOCOL_DEFLATE, compression.PROTOCOL_PLAIN],
+    "none": [compression.PROTOCOL_PLAIN],
+}
 
-def create_client_ssl_context():
+
+def create_client_ssl_context(compress="auto"):
     """
     Cria e configura o contexto SSL para o cliente.
-    
+
     Configurado para aceitar certificados auto-assinados para uso em desenvolvimento.
     Em produção, uma validação adequada de certificados deve ser implementada.
-    
+
+    Args:
+        compress (str): Modo de compressão a oferecer ao servidor (chave de COMPRESSION_OFFERS)
+
     Returns:
         ssl.SSLContext: Contexto SSL configurado para conexões do cliente
         None: Se a configuração SSL falhar
@@ -39,6 +67,7 @@ def create_client_ssl_context():
         # Configuração para certificados auto-assinados (apenas desenvolvimento)
         context.check_hostname = False
         context.verify_mode = ssl.CERT_NONE
+        context.set_alpn_protocols(COMPRESSION_OFFERS[compress])
         print("[INFO] Contexto SSL do cliente configurado com sucesso.")
         return context
     except ssl.SSLError as e:
@@ -49,81 +78,378 @@ def create_client_ssl_context():
         return None
 
 
-def receive_messages(sock):
+class OutputBuffer:
+    """
+    Agrupa o texto recebido e o escreve no terminal em lotes.
+
+    Em vez de um `print` + `flush` por leitura, o texto é acumulado e escrito
+    a cada FLUSH_INTERVAL segundos ou quando o buffer passa de FLUSH_MAX_BUFFER.
+    """
+
+    def __init__(self, stream, interval=FLUSH_INTERVAL, max_buffer=FLUSH_MAX_BUFFER):
+        self.stream = stream
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        """Acumula texto para a próxima escrita agrupada."""
+        if not text:
+            return
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.max_buffer:
+            self.flush()
+
+    def flush(self):
+        """Escreve todo o texto acumulado no terminal de uma só vez."""
+        if not self._parts:
+            return
+        self.stream.write("".join(self._parts))
+        self.stream.flush()
+        self._parts.clear()
+        self._size = 0
+
+    async def run(self):
+        """Escreve periodicamente o texto acumulado até ser cancelado."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.flush()
+        finally:
+            self.flush()
+
+
+class Stats:
+    """Contadores de tráfego exibidos ao final do modo roteirizado."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.lines_sent = 0
+        self.connections = 0
+
+    def report(self):
+        """Retorna um resumo legível dos contadores."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f"[INFO] {self.connections} conexão(ões), {self.lines_sent} linhas enviadas, "
+            f"{self.bytes_received} bytes recebidos ({self.bytes_decoded} descomprimidos) "
+            f"em {elapsed:.1f}s ({self.bytes_received / elapsed / 1024:.1f} KiB/s)"
+        )
+
+
+def start_stdin_reader(loop):
+    """
+    Lê a entrada do usuário em uma thread e a entrega a uma fila asyncio.
+
+    A mesma fila é reaproveitada entre reconexões, de modo que uma leitura
+    bloqueada do terminal nunca fica presa a uma conexão antiga.
+
+    Returns:
+        asyncio.Queue: Fila com as linhas digitadas (None indica fim da entrada)
+    """
+    queue = asyncio.Queue()
+
+    def read_lines():
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(queue.put_nowait, line.rstrip("\r\n"))
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    threading.Thread(target=read_lines, daemon=True).start()
+    return queue
+
+
+async def receive_messages(reader, output, stats, frames=None):
     """
     Recebe e exibe continuamente mensagens do servidor.
-    
-    Esta função é executada em uma thread separada para lidar com mensagens recebidas
-    enquanto a thread principal lida com a entrada do usuário.
-    
+
+    Usa um decodificador incremental, então caracteres multibyte divididos
+    entre duas leituras são montados corretamente em vez de gerar erro.
+
     Args:
-        sock: Conexão socket envolvida com SSL para o servidor
+        reader (asyncio.StreamReader): Fluxo de leitura da conexão SSL
+        output (OutputBuffer): Destino agrupado do texto recebido
+        stats (Stats): Contadores de tráfego
+        frames (compression.FrameDecoder, opcional): Decodificador de quadros comprimidos
+
+    Returns:
+        bool: True se o servidor encerrou a conexão com GOODBYE_MESSAGE (desconexão
+        pedida pelo usuário)
     """
+    decoder = codecs.getincrementaldecoder(ENCODING)(errors="replace")
+    tail = ""  # Final do texto recebido, para reconhecer a despedida do servidor
     while True:
-        try:
-            msg = sock.recv(1024).decode(ENCODING)
-            if not msg:
-                os._exit(0)  # Saída limpa quando o servidor desconecta
-            print(msg, end="")
-            sys.stdout.flush()  # Garante exibição imediata das mensagens do servidor
-        except Exception as e:
-            print(f"[ERRO] Erro ao receber mensagem: {e}")
-            os._exit(1)  # Saída com código de erro
+        data = await reader.read(READ_CHUNK)
+        if not data:
+            text = decoder.decode(b"", final=True)
+            output.write(text)
+            return (tail + text).rstrip().endswith(GOODBYE_MESSAGE)
+        stats.bytes_received += len(data)
+        if frames is not None:
+            try:
+                data = frames.feed(data)
+            except (zlib.error, ValueError) as e:
+                # Quadro corrompido: a conexão é descartada e o cliente reconecta
+                raise ConnectionError(f"Quadro comprimido inválido recebido do servidor: {e}") from e
+        stats.bytes_decoded += len(data)
+        text = decoder.decode(data)
+        output.write(text)
+        tail = (tail + text)[-2 * len(GOODBYE_MESSAGE) :]
+
 
+async def send_line(writer, line, stats):
+    """Envia uma linha ao servidor respeitando o controle de fluxo do transporte."""
+    if line:
+        writer.write(line.encode(ENCODING))
+        await writer.drain()
+        stats.lines_sent += 1
 
-def send_messages(sock):
+
+async def send_messages(writer, stdin_queue, stats):
     """
     Lê continuamente a entrada do usuário e envia mensagens para o servidor.
-    
-    Esta função é executada na thread principal e lida com toda a entrada do usuário,
-    enviando-a para o servidor através da conexão SSL.
-    
+
     Args:
-        sock: Conexão socket envolvida com SSL para o servidor
+        writer (asyncio.StreamWriter): Fluxo de escrita da conexão SSL
+        stdin_queue (asyncio.Queue): Linhas digitadas pelo usuário
+        stats (Stats): Contadores de tráfego
     """
     while True:
+        line = await stdin_queue.get()
+        if line is None:
+            return
+        await send_line(writer, line, stats)
+
+
+def check_script(script_lines):
+    """
+    Verifica as diretivas `@sleep` do roteiro antes de conectar.
+
+    Returns:
+        str: Mensagem de erro da primeira linha inválida
+        None: Se o roteiro for válido
+    """
+    for number, line in enumerate(script_lines, 1):
+        parts = line.split()
+        if parts[:1] != ["@sleep"]:
+            continue
         try:
-            msg = input()
-            sock.send(msg.encode(ENCODING))
-        except:
-            break
+            if len(parts) != 2:
+                raise ValueError
+            seconds = float(parts[1])
+        except ValueError:
+            return f"Linha {number} do roteiro inválida: '{line}' (use @sleep <segundos>)"
+        if not 0 <= seconds < float("inf"):
+            return f"Linha {number} do roteiro inválida: '{line}' (tempo deve ser um número não negativo)"
+    return None
 
 
-def main():
-    """Inicialização do cliente e gerenciamento de conexão principal."""
-    # Inicializa o contexto SSL
-    ssl_context = create_client_ssl_context()
+async def run_script(writer, script_lines, args, stats):
+    """
+    Envia as linhas de um roteiro ao servidor, sem interação do usuário.
+
+    Linhas no formato `@sleep <segundos>` pausam o roteiro; as demais são enviadas
+    com um intervalo de `args.delay` segundos entre si. O roteiro é repetido
+    `args.repeat` vezes.
+
+    Args:
+        writer (asyncio.StreamWriter): Fluxo de escrita da conexão SSL
+        script_lines (list): Linhas do roteiro
+        args (argparse.Namespace): Opções de linha de comando
+        stats (Stats): Contadores de tráfego
+    """
+    first = True
+    for _ in range(args.repeat):
+        for line in script_lines:
+            parts = line.split()
+            if parts[:1] == ["@sleep"]:
+                await asyncio.sleep(float(parts[1]))
+                continue
+            if not first:
+                await asyncio.sleep(args.delay)
+            first = False
+            await send_line(writer, line, stats)
+
+
+async def run_session(ssl_context, args, output, stats, stdin_queue, script_lines):
+    """
+    Mantém uma conexão com o servidor até que ela termine.
+
+    Returns:
+        bool: True se a sessão terminou por decisão do cliente (fim da entrada,
+        fim do roteiro ou pedido de desconexão), False se o servidor encerrou a
+        conexão por conta própria
+    """
+    reader, writer = await asyncio.open_connection(
+        args.host, args.port, ssl=ssl_context, server_hostname=args.host
+    )
+    stats.connections += 1
+    print(f"Conectado ao servidor em {args.host}:{args.port}")
+    print("[INFO] Handshake SSL bem-sucedido com o servidor")
+
+    protocol = writer.get_extra_info("ssl_object").selected_alpn_protocol()
+    frames = None
+    if protocol in (compression.PROTOCOL_DEFLATE, compression.PROTOCOL_DEFLATE_DICT):
+        frames = compression.FrameDecoder(protocol == compression.PROTOCOL_DEFLATE_DICT)
+        print(f"[INFO] Compressão negociada: {protocol}")
+
+    receiver = asyncio.ensure_future(receive_messages(reader, output, stats, frames))
+    if script_lines is not None:
+        sender = asyncio.ensure_future(run_script(writer, script_lines, args, stats))
+    else:
+        sender = asyncio.ensure_future(send_messages(writer, stdin_queue, stats))
+
+    try:
+        done, _ = await asyncio.wait(
+            {receiver, sender}, return_when=asyncio.FIRST_COMPLETED
+        )
+        # Propaga erros de rede da tarefa que terminou primeiro
+        for task in done:
+            task.result()
+        if sender in done and script_lines is not None:
+            # Continua recebendo as respostas por um tempo após o fim do roteiro
+            await asyncio.wait({receiver}, timeout=args.linger)
+        # O servidor se despede antes de fechar a conexão após "Sair (Desconectar)"
+        return sender in done or (receiver in done and receiver.result())
+    finally:
+        for task in (receiver, sender):
+            task.cancel()
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+async def run_client(args, script_lines):
+    """
+    Loop principal do cliente com reconexão automática e espera exponencial.
+
+    Returns:
+        int: Código de saída do processo
+    """
+    ssl_context = create_client_ssl_context(args.compress)
     if ssl_context is None:
         print("[ERRO] Falha ao configurar SSL. Encerrando cliente.")
-        exit(1)
+        return 1
 
-    # Inicializa o socket do cliente
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    output = OutputBuffer(sys.stdout)
+    output_task = asyncio.ensure_future(output.run())
+    stats = Stats()
+    stdin_queue = None
+    if script_lines is None:
+        stdin_queue = start_stdin_reader(asyncio.get_running_loop())
+
+    delay = RECONNECT_INITIAL_DELAY
+    failures = 0
     try:
-        # Estabelece a conexão TCP inicial
-        client_socket.connect((HOST, PORT))
-        print(f"Conectado ao servidor em {HOST}:{PORT}")
-
-        # Envolve a conexão com criptografia SSL
-        ssl_client_socket = ssl_context.wrap_socket(client_socket, server_hostname=HOST)
-        print("[INFO] Handshake SSL bem-sucedido com o servidor")
-
-        # Inicia a thread de recebimento de mensagens
-        threading.Thread(
-            target=receive_messages, args=(ssl_client_socket,), daemon=True
-        ).start()
-        
-        # Trata a entrada do usuário na thread principal
-        send_messages(ssl_client_socket)
-
-    except ConnectionRefusedError:
-        print("[ERRO] Não foi possível conectar ao servidor. Certifique-se de que ele está rodando.")
-    except ssl.SSLError as e:
-        print(f"[ERRO] Falha no handshake SSL: {e}")
-    except Exception as e:
-        print(f"[ERRO] Erro inesperado na conexão: {e}")
+        while True:
+            started = time.monotonic()
+            try:
+                if await run_session(
+                    ssl_context, args, output, stats, stdin_queue, script_lines
+                ):
+                    return 0
+                print("\n[INFO] Conexão encerrada pelo servidor.")
+            except ConnectionRefusedError:
+                print("[ERRO] Não foi possível conectar ao servidor. Certifique-se de que ele está rodando.")
+            except ssl.SSLError as e:
+                print(f"[ERRO] Falha no handshake SSL: {e}")
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                print(f"[ERRO] Erro na conexão: {e}")
+
+            # Só uma sessão que ficou de pé por um tempo recomeça a espera do início
+            if time.monotonic() - started >= STABLE_SESSION:
+                delay = RECONNECT_INITIAL_DELAY
+                failures = 0
+            failures += 1
+
+            output.flush()
+            if not args.reconnect or (args.max_retries and failures > args.max_retries):
+                return 1
+
+            # Espera com variação aleatória para evitar reconexões simultâneas
+            wait = delay * random.uniform(0.5, 1.5)
+            print(f"[INFO] Reconectando em {wait:.1f}s...")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
     finally:
-        client_socket.close()
+        output_task.cancel()
+        try:
+            await output_task
+        except asyncio.CancelledError:
+            pass
+        if script_lines is not None:
+            print(stats.report(), file=sys.stderr)
+
+
+def parse_args(argv=None):
+    """Interpreta os argumentos de linha de comando do cliente."""
+    parser = argparse.ArgumentParser(description="Cliente de chat multi-sala com SSL/TLS.")
+    parser.add_argument(
+        "port", nargs="?", type=int, default=DEFAULT_PORT, help="porta do servidor"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="endereço do servidor")
+    parser.add_argument(
+        "--compress",
+        choices=sorted(COMPRESSION_OFFERS),
+        default="auto",
+        help="compressão a oferecer ao servidor (auto = a melhor disponível)",
+    )
+    parser.add_argument(
+        "--script",
+        help="arquivo com linhas a enviar de forma não interativa ('-' para a entrada padrão)",
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.2, help="intervalo (s) entre linhas do roteiro"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="número de repetições do roteiro"
+    )
+    parser.add_argument(
+        "--linger",
+        type=float,
+        default=1.0,
+        help="tempo (s) recebendo mensagens após o fim do roteiro",
+    )
+    parser.add_argument(
+        "--no-reconnect",
+        dest="reconnect",
+        action="store_false",
+        help="encerra em vez de reconectar quando a conexão cai",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=0,
+        help="máximo de falhas seguidas de conexão (0 = sem limite)",
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    """Inicialização do cliente e gerenciamento de conexão principal."""
+    args = parse_args()
+
+    script_lines = None
+    if args.script:
+        if args.script == "-":
+            script_lines = sys.stdin.read().splitlines()
+        else:
+            with open(args.script, encoding=ENCODING) as f:
+                script_lines = f.read().splitlines()
+        error = check_script(script_lines)
+        if error:
+            print(f"[ERRO] {error}")
+            sys.exit(1)
+
+    try:
+        sys.exit(asyncio.run(run_client(args, script_lines)))
+    except KeyboardInterrupt:
+        print("\n[INFO] Encerrando o cliente...")
 
 
 if __name__ == "__main__":
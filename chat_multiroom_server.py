@@ -7,24 +7,53 @@ Este módulo implementa um servidor de chat multi-thread seguro que suporta:
 - Múltiplas salas de chat (públicas e privadas)
 - Mensagens em tempo real
 - Tratamento concorrente de clientes
+- Reinício sem interrupção (transferência do socket de escuta para um novo processo)
 """
 
+import argparse
+import os
 import socket
 import threading
 import ssl
+import time
+from collections import Counter
+import compression
 import database
+import eventlog
+import handoff
 
 # Configuração do servidor
 HOST = "0.0.0.0"
 PORT = 12345
 ENCODING = "utf-8"
+PRESENCE_INTERVAL = 2.0  # Intervalo (s) entre envios agrupados de atualizações de presença
+PRESENCE_MAX_NAMES = 10  # Máximo de nomes listados em cada atualização de presença
+ROOM_PAGE_SIZE = 20      # Número de salas por página na listagem
+MAX_ROOM_PAGE = 10000    # Maior página aceita na listagem
+ACCEPT_POLL_INTERVAL = 1.0  # Intervalo (s) para o loop de conexões verificar se deve parar
+DRAIN_TIMEOUT = 5.0      # Tempo máximo (s) que o processo antigo atende as sessões existentes
+HANDOFF_ACK_TIMEOUT = 10.0  # Espera máxima (s) pela confirmação do novo processo
+HANDOFF_SPREAD = 10.0    # Janela (s) em que as sessões restantes são encerradas, uma a uma
+EVENT_LOG_DIR = "eventlog"  # Diretório dos segmentos do log binário de eventos
+GOODBYE_MESSAGE = "*** Desconectado. Até logo! ***"  # Reconhecida pelo cliente, que então não reconecta
 
 # Estruturas de dados globais para gerenciamento de clientes
 clients = {}           # Mapeia objetos socket para nomes de usuário
 authenticated = set()  # Conjunto de objetos socket autenticados
-rooms = {}             # Mapeia nomes de salas para conjuntos de sockets de clientes ativos
-user_rooms = {}        # Mapeia objetos socket para nomes de salas atuais
+rooms = {}             # Mapeia nomes de salas com clientes ativos para conjuntos de sockets (criadas sob demanda)
+user_rooms = {}        # Mapeia objetos socket para conjuntos de salas inscritas
+active_rooms = {}      # Mapeia objetos socket para a sala ativa (destino padrão das mensagens)
+room_members = {}      # Mapeia nomes de salas para Counter de usuários online (conexões por usuário)
+presence_deltas = {}   # Mapeia nomes de salas para variações de presença pendentes {usuário: delta}
+room_activity = {}     # Mapeia nomes de salas com clientes ativos para o horário da última mensagem
+sessions = set()       # Conjunto de todos os sockets de clientes conectados (autenticados ou não)
+pending_sends = set()  # Conexões comprimidas com mensagens enfileiradas, enviadas por flush_sends()
+resume_memberships = {}  # Salas de cada usuário herdadas do processo anterior, restauradas no login
+resume_activity = {}     # Horário da última mensagem de cada sala herdado do processo anterior
 lock = threading.Lock()  # Lock de sincronização de threads
+draining = threading.Event()  # Sinaliza que o socket de escuta foi transferido para outro processo
+handoff_done = threading.Event()  # Sinaliza que a transferência terminou com sucesso
+event_log = None       # Gravador do log de eventos (eventlog.EventLog), criado em main()
 
 
 def create_ssl_context():
@@ -40,6 +69,8 @@ def create_ssl_context():
     try:
         context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
         context.load_cert_chain("cert.pem", "key.pem")
+        # Modos de compressão oferecidos aos clientes durante o handshake
+        context.set_alpn_protocols(compression.ALPN_PROTOCOLS)
         print("[INFO] Certificados SSL carregados com sucesso.")
         return context
     except FileNotFoundError as e:
@@ -62,26 +93,238 @@ def broadcast(msg, room, sender=None):
         room (str): Nome da sala de destino
         sender (socket, opcional): Socket do remetente para excluir da transmissão
         
+    Returns:
+        int: Número de clientes para os quais a mensagem foi enviada
+        
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    return broadcast_to_rooms(msg, (room,), sender)
+
+def broadcast_to_rooms(msg, target_rooms, sender=None):
+    """
+    Transmite uma mensagem para a união dos clientes de várias salas.
+    
+    Cada conexão recebe a mensagem uma única vez, mesmo que esteja inscrita
+    em mais de uma das salas de destino. A mensagem é codificada uma só vez.
+    Para conexões com compressão, ela é apenas enfileirada: a compressão e o envio
+    acontecem em `flush_sends`, que deve ser chamada após liberar o lock.
+    
+    Args:
+        msg (str): Mensagem para transmitir
+        target_rooms (iterable): Nomes das salas de destino
+        sender (socket, opcional): Socket do remetente para excluir da transmissão
+        
+    Returns:
+        int: Número de clientes para os quais a mensagem foi enviada ou enfileirada
+        
     Nota:
         Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
     """
     if not msg.endswith("\n"):
         msg += "\n"
+    payload = msg.encode(ENCODING)
+
+    recipients = set()
+    for room in target_rooms:
+        recipients.update(rooms.get(room, ()))
+    recipients.discard(sender)
+
+    # Com vários destinatários e mensagens grandes, compartilha um único quadro comprimido
+    shared = None
+    if len(recipients) > 1 and len(payload) >= compression.SHARED_MIN_SIZE:
+        shared = compression.SharedPayload(payload)
 
     dead_sockets = []
-    for client in list(rooms.get(room, [])):
-        if client != sender:
-            try:
-                client.send(msg.encode(ENCODING))
-            except Exception as e:
-                print(
-                    f"[INFO] Falha ao enviar mensagem para {clients.get(client, 'desconhecido')}. Marcando para remoção: {e}"
-                )
-                dead_sockets.append(client)
+    for client in recipients:
+        if isinstance(client, compression.CompressedConnection):
+            client.enqueue(shared or payload)
+            pending_sends.add(client)
+            continue
+        try:
+            client.send(payload)
+        except Exception as e:
+            print(
+                f"[INFO] Falha ao enviar mensagem para {clients.get(client, 'desconhecido')}. Marcando para remoção: {e}"
+            )
+            dead_sockets.append(client)
 
     # Limpa clientes desconectados
     for dead_socket in dead_sockets:
-        _handle_leave_room(dead_socket, silent=True)
+        _leave_all_rooms(dead_socket)
+    return len(recipients) - len(dead_sockets)
+
+def flush_sends():
+    """
+    Comprime e envia as mensagens enfileiradas por `broadcast_to_rooms`.
+    
+    Deve ser chamada sem o lock adquirido: a compressão de cada conexão
+    acontece fora do lock, sem bloquear as demais threads. A ordem das
+    mensagens de cada conexão é preservada.
+    """
+    global pending_sends
+    with lock:
+        connections, pending_sends = pending_sends, set()
+
+    dead_sockets = []
+    for client in connections:
+        try:
+            client.flush()
+        except Exception as e:
+            print(
+                f"[INFO] Falha ao enviar mensagem para {clients.get(client, 'desconhecido')}. Marcando para remoção: {e}"
+            )
+            dead_sockets.append(client)
+
+    if dead_sockets:
+        with lock:
+            for dead_socket in dead_sockets:
+                _leave_all_rooms(dead_socket)
+
+def _log_event(kind, *fields):
+    """Registra um evento no log binário (sem E/S nesta thread), se ele estiver ativo."""
+    if event_log is not None:
+        event_log.record(kind, *fields)
+
+def _subscribe(sock, room):
+    """
+    Inscreve um cliente em uma sala e a torna sua sala ativa.
+    
+    O estado em memória da sala é criado sob demanda na primeira inscrição.
+    
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    if room not in rooms:
+        rooms[room] = set()
+        if room in resume_activity:
+            room_activity[room] = resume_activity.pop(room)
+    rooms[room].add(sock)
+    user_rooms.setdefault(sock, set()).add(room)
+    active_rooms[sock] = room
+
+    user = clients.get(sock)
+    _log_event(eventlog.JOIN, user, room)
+    members = room_members.setdefault(room, Counter())
+    members[user] += 1
+    if members[user] == 1:
+        _queue_presence(room, user, 1)
+
+def _unsubscribe(sock, room):
+    """
+    Remove a inscrição de um cliente em uma sala.
+    
+    Se a sala removida era a sala ativa, outra sala inscrita (se houver) passa a ser a ativa.
+    Quando a sala fica vazia, seu estado em memória é descartado.
+    
+    Returns:
+        bool: True se o cliente estava inscrito na sala, False caso contrário
+        
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    subscribed = user_rooms.get(sock)
+    if not subscribed or room not in subscribed:
+        return False
+
+    subscribed.discard(room)
+    if not subscribed:
+        del user_rooms[sock]
+    members_socks = rooms.get(room, set())
+    members_socks.discard(sock)
+    if not members_socks:
+        rooms.pop(room, None)
+        room_activity.pop(room, None)
+
+    user = clients.get(sock)
+    _log_event(eventlog.LEAVE, user, room)
+    members = room_members.get(room)
+    if members is not None:
+        members[user] -= 1
+        if members[user] <= 0:
+            del members[user]
+            _queue_presence(room, user, -1)
+        if not members:
+            del room_members[room]
+
+    if active_rooms.get(sock) == room:
+        if subscribed:
+            active_rooms[sock] = min(subscribed)
+        else:
+            active_rooms.pop(sock, None)
+    return True
+
+def _leave_all_rooms(sock):
+    """
+    Remove todas as inscrições de um cliente sem notificar ninguém.
+    
+    Returns:
+        set: Salas das quais o cliente foi removido
+        
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    left = set(user_rooms.get(sock, ()))
+    for room in left:
+        _unsubscribe(sock, room)
+    return left
+
+def _queue_presence(room, user, delta):
+    """
+    Registra uma entrada (+1) ou saída (-1) de usuário para o próximo envio agrupado.
+    
+    Entradas e saídas do mesmo usuário dentro de um intervalo se anulam.
+    
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    pending = presence_deltas.setdefault(room, {})
+    pending[user] = pending.get(user, 0) + delta
+    if pending[user] == 0:
+        del pending[user]
+
+def _format_names(names):
+    """Formata uma lista de nomes, truncando-a em PRESENCE_MAX_NAMES."""
+    names = sorted(names)
+    shown = ", ".join(names[:PRESENCE_MAX_NAMES])
+    if len(names) > PRESENCE_MAX_NAMES:
+        shown += f" e mais {len(names) - PRESENCE_MAX_NAMES}"
+    return shown
+
+def flush_presence():
+    """
+    Envia uma única atualização de presença por sala com as variações acumuladas.
+    
+    Uma sequência de entradas e saídas vira uma mensagem "+N / -M" por intervalo,
+    em vez de uma transmissão por evento.
+    
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    global presence_deltas
+    pending, presence_deltas = presence_deltas, {}
+
+    for room, deltas in pending.items():
+        joined = [user for user, delta in deltas.items() if delta > 0]
+        left = [user for user, delta in deltas.items() if delta < 0]
+        if not joined and not left:
+            continue
+
+        online = len(room_members.get(room, ()))
+        msg = f"*** [{room}] presença: +{len(joined)} / -{len(left)} ({online} online)"
+        if joined:
+            msg += f" | entraram: {_format_names(joined)}"
+        if left:
+            msg += f" | saíram: {_format_names(left)}"
+        broadcast(msg + " ***", room)
+
+def _presence_loop():
+    """Loop da thread que envia as atualizações de presença a cada PRESENCE_INTERVAL."""
+    while True:
+        time.sleep(PRESENCE_INTERVAL)
+        with lock:
+            flush_presence()
+        flush_sends()
 
 def _handle_register(sock):
     """Gerencia o processo de registro de usuário."""
@@ -139,28 +382,144 @@ def _handle_login(sock):
         return False
 
     if database.check_user_credentials(user, pwd):
+        _log_event(eventlog.LOGIN, user, 1)
         authenticated.add(sock)
         clients[sock] = user
         sock.send("\nLogin bem-sucedido!\n".encode(ENCODING))
+        _resume_rooms(sock, user)
         return True
     else:
+        _log_event(eventlog.LOGIN, user, 0)
         sock.send("\nErro: Nome de usuário ou senha inválidos.\n".encode(ENCODING))
         return False
 
+def _resume_rooms(sock, user):
+    """
+    Reinscreve o usuário nas salas em que estava antes do reinício do servidor.
+    
+    As salas vêm do estado transferido pelo processo anterior e são usadas
+    apenas no primeiro login do usuário após o reinício.
+    """
+    with lock:
+        restored = [
+            room for room in resume_memberships.pop(user, [])
+            if database.get_room_details(room)
+        ]
+        for room in restored:
+            _subscribe(sock, room)
+    if restored:
+        sock.send(
+            f"Suas salas foram restauradas: {', '.join(restored)}. Escolha 6 para voltar ao chat.\n".encode(
+                ENCODING
+            )
+        )
+
+def _rooms_by_activity(offset, limit):
+    """
+    Retorna uma página de tuplas (nome_da_sala, é_privada) das salas com usuários online,
+    ordenadas por número de usuários e pela mensagem mais recente.
+    
+    Apenas salas materializadas em memória são consideradas, pois salas vazias não têm atividade.
+    """
+    with lock:
+        ranked = sorted(
+            rooms,
+            key=lambda name: (len(room_members.get(name, ())), room_activity.get(name, 0)),
+            reverse=True,
+        )
+    page = ranked[offset : offset + limit]
+    privacy = database.get_rooms_privacy(page)
+    return [(name, privacy.get(name, False)) for name in page if name in privacy]
+
 def _handle_list_rooms(sock):
-    """Envia lista de salas disponíveis para o cliente."""
-    all_rooms = database.get_rooms()
-    if all_rooms:
+    """
+    Envia uma página da lista de salas, com o número de usuários online, para o cliente.
+    
+    O cliente pode filtrar por prefixo do nome ou ordenar por atividade, e escolher a página.
+    """
+    sock.send("\n--- LISTAR SALAS ---\n".encode(ENCODING))
+    sock.send(
+        "Digite um prefixo (ou * para todas, ou #ativas para ordenar por atividade) e, opcionalmente, a página.\n".encode(
+            ENCODING
+        )
+    )
+    sock.send("Ex: * 1   |   sala 2   |   #ativas\n".encode(ENCODING))
+    sock.send("Sua entrada: ".encode(ENCODING))
+
+    parts = sock.recv(1024).decode(ENCODING).split()
+    page = 1
+    if parts and parts[-1].isdecimal():
+        page = max(int(parts.pop()), 1)
+        if page > MAX_ROOM_PAGE:
+            sock.send(
+                f"\nPágina inválida. Use um número entre 1 e {MAX_ROOM_PAGE}.\n".encode(ENCODING)
+            )
+            return
+    query = parts[0] if parts else "*"
+    offset = (page - 1) * ROOM_PAGE_SIZE
+
+    # Busca uma sala a mais para saber se existe próxima página
+    if query == "#ativas":
+        found = _rooms_by_activity(offset, ROOM_PAGE_SIZE + 1)
+    else:
+        prefix = "" if query == "*" else query
+        found = database.search_rooms(prefix, ROOM_PAGE_SIZE + 1, offset)
+    has_next = len(found) > ROOM_PAGE_SIZE
+    found = found[:ROOM_PAGE_SIZE]
+
+    if found:
+        with lock:
+            online = {name: len(room_members.get(name, ())) for name, _ in found}
         room_list_str = "\n".join(
             [
-                f"- {name} (Privada)" if is_private else f"- {name}"
-                for name, is_private in all_rooms
+                (f"- {name} (Privada)" if is_private else f"- {name}")
+                + f" [{online[name]} online]"
+                for name, is_private in found
             ]
         )
-        sock.send(f"\n--- SALAS DISPONÍVEIS ---\n{room_list_str}\n".encode(ENCODING))
+        footer = f"Página {page}"
+        if has_next:
+            footer += f" (mais resultados: {query} {page + 1})"
+        sock.send(
+            f"\n--- SALAS DISPONÍVEIS ---\n{room_list_str}\n{footer}\n".encode(ENCODING)
+        )
     else:
         sock.send("\nNenhuma sala disponível.\n".encode(ENCODING))
 
+def _handle_who(sock, room_name):
+    """
+    Envia ao cliente a lista de usuários online em uma sala.
+    
+    Salas públicas podem ser consultadas sem entrar nelas; salas privadas
+    apenas por quem já está inscrito.
+    
+    Args:
+        sock: Conexão socket do cliente
+        room_name (str): Nome da sala consultada
+    """
+    room_details = database.get_room_details(room_name)
+    if not room_details:
+        sock.send("\nErro: Sala inexistente.\n".encode(ENCODING))
+        return
+
+    with lock:
+        subscribed = room_name in user_rooms.get(sock, set())
+        members = sorted(room_members.get(room_name, ()))
+
+    if room_details[1] and not subscribed:
+        sock.send(
+            "\nErro: Apenas membros podem ver quem está em uma sala privada.\n".encode(
+                ENCODING
+            )
+        )
+        return
+
+    sock.send(
+        f"\n--- ONLINE EM {room_name} ({len(members)}) ---\n{', '.join(members) or 'ninguém'}\n".encode(
+            ENCODING
+        )
+    )
+
 def _handle_create_room(sock):
     """Gerencia o processo de criação de salas públicas e privadas."""
     sock.send("\n--- CRIAR NOVA SALA ---\n".encode(ENCODING))
@@ -208,7 +567,6 @@ def _handle_create_room(sock):
 
     with lock:
         if database.create_room(room_name, room_password):
-            rooms[room_name] = set()
             sock.send(f"\nSala '{room_name}' criada com sucesso!\n".encode(ENCODING))
         else:
             sock.send(
@@ -265,50 +623,68 @@ def _handle_join_room(sock):
                 sock.send("\nErro: Senha incorreta para esta sala.\n".encode(ENCODING))
                 return False
 
-        # Remove usuário da sala atual se já estiver em uma
-        if sock in user_rooms:
-            _handle_leave_room(sock, silent=True)
-
-        # Inicializa sala se for o primeiro usuário entrando
-        if room_name not in rooms:
-            rooms[room_name] = set()
-
-        # Adiciona usuário à sala
-        rooms[room_name].add(sock)
-        user_rooms[sock] = room_name
+        # Já inscrito: apenas torna a sala ativa
+        if room_name in user_rooms.get(sock, set()):
+            active_rooms[sock] = room_name
+            sock.send(
+                f"\nVocê já está na sala '{room_name}'. Ela agora é sua sala ativa.\n".encode(
+                    ENCODING
+                )
+            )
+            return True
 
-        # Notifica outros usuários na sala
-        broadcast(f"*** {clients[sock]} entrou na sala. ***", room_name, sock)
+        # Adiciona usuário à sala, mantendo as demais inscrições.
+        # Os demais usuários são notificados na próxima atualização de presença.
+        _subscribe(sock, room_name)
 
     sock.send(f"\nVocê entrou na sala '{room_name}'.\n".encode(ENCODING))
     return True
 
-def _handle_leave_room(sock, silent=False):
+def _handle_leave_room(sock, room=None, silent=False):
     """
-    Remove um cliente de sua sala atual.
+    Remove um cliente de uma de suas salas.
     
     Args:
         sock: Conexão socket do cliente
+        room (str, opcional): Sala a deixar; por padrão, a sala ativa
         silent (bool): Se True, não envia mensagem de confirmação para o cliente
         
     Nota:
         Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
     """
-    room = user_rooms.pop(sock, None)
-    if room and sock in rooms.get(room, set()):
-        rooms[room].remove(sock)
-        broadcast(
-            f"*** {clients.get(sock, 'Um usuário')} saiu da sala. ***", room, sock
-        )
+    if room is None:
+        room = active_rooms.get(sock)
+
+    if room and _unsubscribe(sock, room):
+        notice = f"\nVocê saiu da sala '{room}'.\n"
+        if sock in active_rooms:
+            notice += f"Sala ativa: '{active_rooms[sock]}'.\n"
+    else:
+        notice = "\nVocê não está nessa sala.\n"
+
     if not silent:
         try:
-            sock.send("\nVocê saiu da sala.\n".encode(ENCODING))
+            sock.send(notice.encode(ENCODING))
         except Exception as e:
             print(f"[INFO] Não foi possível notificar cliente sobre saída da sala: {e}")
 
+def _send_chat(sock, room, text):
+    """
+    Envia uma mensagem de chat do cliente para uma sala e registra a atividade da sala.
+    
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    room_activity[room] = time.time()
+    delivered = broadcast(f"[{clients[sock]}@{room}]: {text}", room, sock)
+    _log_event(eventlog.MESSAGE, clients[sock], room, len(text.encode(ENCODING)), delivered)
+
 def _handle_chat_mode(sock):
     """
-    Gerencia mensagens de chat em tempo real dentro de uma sala.
+    Gerencia mensagens de chat em tempo real dentro das salas inscritas.
+    
+    Mensagens comuns vão para a sala ativa; `/to <sala> <mensagem>` envia para
+    qualquer outra sala em que o cliente esteja inscrito.
     
     Args:
         sock: Conexão socket do cliente
@@ -318,9 +694,11 @@ def _handle_chat_mode(sock):
     """
     sock.send("\n--- MODO CHAT ---\n".encode(ENCODING))
     sock.send(
-        "Você está na sala. Digite suas mensagens. Para voltar ao menu, digite /menu. Para sair da sala, digite /leave.\n".encode(
-            ENCODING
-        )
+        (
+            "Você está na sala. Digite suas mensagens. Para voltar ao menu, digite /menu. Para sair da sala, digite /leave [sala].\n"
+            "Para enviar a outra sala inscrita, digite /to <sala> <mensagem>. Para trocar a sala ativa, digite /switch <sala>. Para listar suas salas, digite /rooms.\n"
+            "Para ver quem está online, digite /who [sala].\n"
+        ).encode(ENCODING)
     )
     while True:
         try:
@@ -328,19 +706,63 @@ def _handle_chat_mode(sock):
             if not data:
                 return False
 
-            if data.strip().lower() == "/menu":
-                return True
-            elif data.strip().lower() == "/leave":
-                _handle_leave_room(sock)
+            text = data.strip()
+            command = text.split(" ", 1)[0].lower()
+
+            if command == "/menu":
                 return True
+            elif command == "/leave":
+                parts = text.split()
+                with lock:
+                    _handle_leave_room(sock, parts[1] if len(parts) > 1 else None)
+                    still_in_room = sock in user_rooms
+                if not still_in_room:
+                    return True
+            elif command == "/switch":
+                parts = text.split()
+                with lock:
+                    ok = len(parts) > 1 and parts[1] in user_rooms.get(sock, set())
+                    if ok:
+                        active_rooms[sock] = parts[1]
+                if ok:
+                    sock.send(f"Sala ativa: '{parts[1]}'.\n".encode(ENCODING))
+                else:
+                    sock.send("Uso: /switch <sala inscrita>\n".encode(ENCODING))
+            elif command == "/rooms":
+                with lock:
+                    subscribed = sorted(user_rooms.get(sock, set()))
+                    active = active_rooms.get(sock)
+                listing = ", ".join(
+                    f"{name} (ativa)" if name == active else name for name in subscribed
+                )
+                sock.send(f"Suas salas: {listing or 'nenhuma'}\n".encode(ENCODING))
+            elif command == "/who":
+                parts = text.split()
+                with lock:
+                    room = parts[1] if len(parts) > 1 else active_rooms.get(sock)
+                if room:
+                    _handle_who(sock, room)
+                else:
+                    sock.send("Uso: /who <sala>\n".encode(ENCODING))
+            elif command == "/to":
+                parts = text.split(" ", 2)
+                with lock:
+                    room = parts[1] if len(parts) > 2 else None
+                    if room in user_rooms.get(sock, set()):
+                        _send_chat(sock, room, parts[2])
+                    else:
+                        room = None
+                flush_sends()
+                if not room:
+                    sock.send(
+                        "Uso: /to <sala inscrita> <mensagem>\n".encode(ENCODING)
+                    )
             else:
                 with lock:
-                    room = user_rooms.get(sock)
+                    room = active_rooms.get(sock)
                     if room:
-                        msg = f"[{clients[sock]}@{room}]: {data.strip()}"
-                        broadcast(msg, room, sock)
-                    else:
-                        pass
+                        _send_chat(sock, room, text)
+                flush_sends()
                 if not room:
                     sock.send(
                         "Você não está em uma sala. Digite /menu para voltar ao menu principal.\n".encode(
@@ -360,9 +782,11 @@ def handle_client(sock):
     - IN_CHAT_ROOM: Modo de chat ativo
     
     Args:
-        sock: Conexão socket do cliente envolvida com SSL
+        sock: Conexão socket do cliente envolvida com SSL (e com compressão, se negociada)
     """
     current_state = "AUTH_MENU"
+    with lock:
+        sessions.add(sock)
 
     try:
         while True:
@@ -404,11 +828,12 @@ Sua escolha:
                     "2. Criar Sala",
                     "3. Entrar em Sala",
                     "4. Sair (Desconectar)",
+                    "/who <sala> - Ver quem está online",
                 ]
 
                 in_room = sock in user_rooms
                 if in_room:
-                    current_room_name = user_rooms[sock]
+                    current_room_name = active_rooms[sock]
                     menu_options.insert(
                         4, f"5. Sair da Sala Atual ({current_room_name})"
                     )
@@ -433,7 +858,10 @@ Sua escolha:
                     if _handle_join_room(sock):
                         current_state = "IN_CHAT_ROOM"
                 elif choice == "4":
+                    sock.send(f"\n{GOODBYE_MESSAGE}\n".encode(ENCODING))
                     break
+                elif choice.split(" ", 1)[0].lower() == "/who" and len(choice.split()) > 1:
+                    _handle_who(sock, choice.split()[1])
                 elif choice == "5" and in_room:
                     with lock:
                         _handle_leave_room(sock)
@@ -453,62 +881,239 @@ Sua escolha:
     finally:
         # Limpeza quando cliente desconecta
         with lock:
+            left = _leave_all_rooms(sock)
             user = clients.pop(sock, None)
-            room = user_rooms.pop(sock, None)
-            if room and user and rooms.get(room):
-                print(f"[INFO] Limpando usuário {user} da sala {room}.")
-                rooms[room].discard(sock)
-                broadcast(f"*** {user} desconectou-se. ***", room)
+            if left and user:
+                print(f"[INFO] Limpando usuário {user} das salas {', '.join(sorted(left))}.")
 
             if sock in authenticated:
                 authenticated.discard(sock)
+            sessions.discard(sock)
+            pending_sends.discard(sock)
+        _log_event(eventlog.DISCONNECT, user or "")
+        if isinstance(sock, compression.CompressedConnection):
+            print(f"[INFO] Compressão para {user or 'desconhecido'}: {sock.stats.summary()}")
         sock.close()
 
+def snapshot_state():
+    """
+    Resume o estado das salas para o processo que assume o servidor.
+    
+    Returns:
+        dict: `memberships` (salas de cada usuário conectado) e `activity`
+        (horário da última mensagem de cada sala)
+        
+    Nota:
+        Esta função deve ser chamada dentro de um bloco `with lock:` para segurança de thread.
+    """
+    memberships = {}
+    for sock, subscribed in user_rooms.items():
+        user = clients.get(sock)
+        if user:
+            memberships.setdefault(user, set()).update(subscribed)
+    return {
+        "memberships": {user: sorted(names) for user, names in memberships.items()},
+        "activity": dict(room_activity),
+    }
+
+def _drain_and_handoff(control, server_socket, accept_stopped):
+    """
+    Transfere o servidor para o processo que se conectou ao socket de controle.
+    
+    1. Envia o socket de escuta ao novo processo e aguarda sua confirmação;
+       só então para de aceitar conexões.
+    2. Continua atendendo as sessões existentes por até DRAIN_TIMEOUT segundos.
+       Nesse período, usuários dos dois processos não veem as mensagens uns dos outros,
+       por isso a drenagem é curta.
+    3. Envia o estado das salas das sessões restantes ao novo processo.
+    4. Encerra essas sessões espaçadas ao longo de HANDOFF_SPREAD segundos, para
+       que as reconexões cheguem aos poucos; no novo processo, cada usuário volta
+       às suas salas automaticamente ao fazer login.
+    
+    Se a transferência falhar antes do passo 4, o servidor volta a aceitar
+    conexões e aguarda um novo pedido no socket de controle.
+    """
+    while True:
+        conn, _ = control.accept()
+        print("[INFO] Novo processo solicitou o servidor. Transferindo socket de escuta...")
+        try:
+            handoff.send_listener(conn, server_socket)
+            handoff.wait_ack(conn, HANDOFF_ACK_TIMEOUT)
+        except (OSError, RuntimeError) as e:
+            print(f"[ERRO] Falha ao transferir o socket de escuta: {e}. O servidor continua em execução.")
+            conn.close()
+            continue
+
+        draining.set()
+        accept_stopped.wait()
+        print("[INFO] Socket de escuta transferido. Drenando sessões existentes...")
+
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while time.monotonic() < deadline:
+            with lock:
+                if not sessions:
+                    break
+            time.sleep(0.5)
+
+        try:
+            with lock:
+                handoff.send_state(conn, snapshot_state())
+                remaining = list(sessions)
+        except OSError as e:
+            # O novo processo caiu durante a drenagem: este volta a aceitar conexões
+            print(f"[ERRO] Falha ao enviar o estado ao novo processo: {e}. O servidor continua em execução.")
+            conn.close()
+            accept_stopped.clear()
+            draining.clear()
+            continue
+        conn.close()
+        break
+    control.close()
+
+    print(f"[INFO] Encerrando {len(remaining)} sessões restantes.")
+    notice = "\n*** O servidor foi reiniciado. Reconecte-se para continuar; suas salas serão restauradas. ***\n"
+    for sock in remaining:
+        try:
+            sock.send(notice.encode(ENCODING))
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception as e:
+            print(f"[INFO] Não foi possível encerrar sessão durante a transferência: {e}")
+        time.sleep(HANDOFF_SPREAD / len(remaining))
+    handoff_done.set()
+
+def _receive_resume_state(conn):
+    """Recebe do processo anterior o estado das salas e o guarda para os próximos logins."""
+    try:
+        state = handoff.receive_state(conn)
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] Falha ao receber o estado do processo anterior: {e}")
+        return
+    finally:
+        conn.close()
+
+    with lock:
+        resume_memberships.update(state.get("memberships", {}))
+        resume_activity.update(state.get("activity", {}))
+    print(f"[INFO] Estado recebido: {len(resume_memberships)} usuários a restaurar.")
+
+def parse_args(argv=None):
+    """Interpreta os argumentos de linha de comando do servidor."""
+    parser = argparse.ArgumentParser(description="Servidor de chat multi-sala com SSL/TLS.")
+    parser.add_argument(
+        "--takeover",
+        action="store_true",
+        help="assume o socket de escuta de um servidor em execução (reinício sem interrupção)",
+    )
+    parser.add_argument(
+        "--handoff-path",
+        default=handoff.HANDOFF_PATH,
+        help="caminho do socket de controle usado na transferência",
+    )
+    return parser.parse_args(argv)
+
 def main():
     """Loop principal de inicialização do servidor e tratamento de conexões."""
+    args = parse_args()
+
     # Inicializa contexto SSL
     ssl_context = create_ssl_context()
     if ssl_context is None:
         print("[ERRO] Falha ao configurar SSL. Encerrando servidor.")
         exit(1)
 
-    # Inicializa socket do servidor
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.bind((HOST, PORT))
-    server_socket.listen()
+    if args.takeover:
+        # Assume o socket de escuta do processo em execução
+        if not handoff.is_supported():
+            print("[ERRO] Reinício sem interrupção não é suportado neste sistema.")
+            exit(1)
+        try:
+            server_socket, state_conn = handoff.request_takeover(args.handoff_path)
+        except (OSError, RuntimeError) as e:
+            print(f"[ERRO] Não foi possível assumir o servidor em execução: {e}")
+            exit(1)
+        threading.Thread(
+            target=_receive_resume_state, args=(state_conn,), daemon=True
+        ).start()
+        print("[INFO] Socket de escuta recebido do processo anterior.")
+    else:
+        # Inicializa socket do servidor
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((HOST, PORT))
+        server_socket.listen()
+    server_socket.settimeout(ACCEPT_POLL_INTERVAL)
 
     # Inicializa banco de dados
     database.init_db()
 
-    # Carrega salas existentes do banco de dados para a memória
-    global rooms
-    rooms = {room_name: set() for room_name, _ in database.get_rooms()}
+    # O estado das salas é criado sob demanda quando o primeiro usuário entra
     print(f"[INFO] Servidor SSL rodando em {HOST}:{PORT}")
 
+    # Inicia o envio agrupado de atualizações de presença
+    threading.Thread(target=_presence_loop, daemon=True).start()
+
+    # Inicia a gravação do log de eventos
+    global event_log
+    event_log = eventlog.EventLog(EVENT_LOG_DIR)
+
+    # Aguarda um novo processo que queira assumir o servidor
+    handoff_thread = None
+    accept_stopped = threading.Event()
+    if handoff.is_supported():
+        control = handoff.listen(args.handoff_path)
+        handoff_thread = threading.Thread(
+            target=_drain_and_handoff,
+            args=(control, server_socket, accept_stopped),
+            daemon=True,
+        )
+        handoff_thread.start()
+
     try:
-        while True:
-            client_socket, addr = server_socket.accept()
-            print(f"[INFO] Nova conexão de {addr}")
+        while not handoff_done.is_set():
+            while not draining.is_set():
+                try:
+                    client_socket, addr = server_socket.accept()
+                except socket.timeout:
+                    continue
+                print(f"[INFO] Nova conexão de {addr}")
 
-            try:
-                # Envolve socket aceito com SSL
-                ssl_client_socket = ssl_context.wrap_socket(client_socket, server_side=True)
-                print(f"[INFO] Handshake SSL bem-sucedido com {addr}")
-                threading.Thread(
-                    target=handle_client, args=(ssl_client_socket,), daemon=True
-                ).start()
-            except ssl.SSLError as e:
-                print(f"[ERRO] Falha no handshake SSL com {addr}: {e}")
-                client_socket.close()
-            except Exception as e:
-                print(f"[ERRO] Erro inesperado ao processar conexão de {addr}: {e}")
-                client_socket.close()
+                try:
+                    # Envolve socket aceito com SSL
+                    ssl_client_socket = ssl_context.wrap_socket(client_socket, server_side=True)
+                    print(f"[INFO] Handshake SSL bem-sucedido com {addr}")
+                    # Aplica a compressão negociada no handshake (se houver)
+                    ssl_client_socket = compression.wrap_connection(ssl_client_socket)
+                    threading.Thread(
+                        target=handle_client, args=(ssl_client_socket,), daemon=True
+                    ).start()
+                except ssl.SSLError as e:
+                    print(f"[ERRO] Falha no handshake SSL com {addr}: {e}")
+                    client_socket.close()
+                except Exception as e:
+                    print(f"[ERRO] Erro inesperado ao processar conexão de {addr}: {e}")
+                    client_socket.close()
+
+            # Socket de escuta transferido: aguarda o fim da drenagem, ou volta a
+            # aceitar conexões se a transferência falhar
+            accept_stopped.set()
+            while draining.is_set() and not handoff_done.wait(ACCEPT_POLL_INTERVAL):
+                pass
+
+        handoff_thread.join()
+        print("[INFO] Transferência concluída. Encerrando o processo antigo.")
 
     except KeyboardInterrupt:
         print("\n[INFO] Encerrando o servidor...")
+        if handoff_thread and not draining.is_set():
+            try:
+                os.unlink(args.handoff_path)
+            except FileNotFoundError:
+                pass
     finally:
+        print(f"[INFO] Compressão total: {compression.server_stats.summary()}")
         server_socket.close()
+        event_log.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,257 @@
+"""
+Compressão de mensagens negociada por conexão.
+
+O modo de compressão é negociado no handshake TLS via ALPN, sem mensagens extras:
+- "chat-deflate-dict": deflate com dicionário pré-definido de textos comuns do servidor
+- "chat-deflate": deflate sem dicionário
+- "chat" (ou nenhum protocolo ALPN): texto UTF-8 puro, como nos clientes antigos
+
+Com compressão ativa, o servidor envia quadros no formato [tipo:1][tamanho:4][dados]:
+- FRAME_STREAM: comprimido com o contexto deflate persistente da conexão
+- FRAME_SHARED: comprimido uma única vez e enviado a vários destinatários
+- FRAME_RAW: sem compressão (quando comprimir aumentaria o tamanho)
+
+O sentido cliente -> servidor continua em texto puro.
+"""
+
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+ENCODING = "utf-8"
+
+PROTOCOL_PLAIN = "chat"
+PROTOCOL_DEFLATE = "chat-deflate"
+PROTOCOL_DEFLATE_DICT = "chat-deflate-dict"
+# Ordem de preferência do servidor
+ALPN_PROTOCOLS = [PROTOCOL_DEFLATE_DICT, PROTOCOL_DEFLATE, PROTOCOL_PLAIN]
+
+FRAME_STREAM = 0
+FRAME_SHARED = 1
+FRAME_RAW = 2
+FRAME_HEADER = struct.Struct("!BI")
+
+COMPRESSION_LEVEL = 6
+WBITS = -15  # deflate puro, sem cabeçalho zlib
+# Abaixo deste tamanho, o contexto persistente de cada conexão comprime bem melhor
+# do que um quadro independente; o custo de comprimir por conexão fica fora do lock
+# do servidor (ver CompressedConnection.enqueue)
+SHARED_MIN_SIZE = 512
+
+# Textos frequentes do servidor; os mais comuns ficam no final, onde o deflate os alcança com menor custo
+PRESET_DICTIONARY = (
+    "\n----------------------------------------\n|        Bem-vindo ao Chat!            |\n"
+    "| Escolha uma opção:                   |\n| 1. Registrar Novo Usuário            |\n"
+    "| 2. Fazer Login                       |\n"
+    "\n--- REGISTRAR NOVO USUÁRIO ---\n\n--- FAZER LOGIN ---\n"
+    "Digite seu usuário e senha, separados por espaço (ex: usuario_existente 12345): "
+    "\nLogin bem-sucedido!\n\nErro: Nome de usuário ou senha inválidos.\n"
+    "\n--- CRIAR NOVA SALA ---\n\n--- ENTRAR EM SALA ---\n"
+    "Digite o nome da sala e a senha (se for privada), separados por espaço:\n"
+    "\n--- LISTAR SALAS ---\n"
+    "Digite um prefixo (ou * para todas, ou #ativas para ordenar por atividade) e, opcionalmente, a página.\n"
+    "\n--- SALAS DISPONÍVEIS ---\n\n--- MODO CHAT ---\n"
+    "Você está na sala. Digite suas mensagens. Para voltar ao menu, digite /menu. Para sair da sala, digite /leave [sala].\n"
+    "Para enviar a outra sala inscrita, digite /to <sala> <mensagem>. Para trocar a sala ativa, digite /switch <sala>. Para listar suas salas, digite /rooms.\n"
+    "Para ver quem está online, digite /who [sala].\n"
+    "\n----------------------------------------\n|        Menu Principal                |\n"
+    "----------------------------------------\n| 1. Listar Salas                      |\n"
+    "| 2. Criar Sala                        |\n| 3. Entrar em Sala                    |\n"
+    "| 4. Sair (Desconectar)                |\n| 5. Sair da Sala Atual (\n"
+    "| 6. Voltar para o Chat                |\n| /who <sala> - Ver quem está online   |\n"
+    "----------------------------------------\nSua escolha: "
+    "\nVocê entrou na sala '\nVocê saiu da sala '\n--- ONLINE EM "
+    " online] online)\n- (Privada) [Página "
+    "*** [] presença: +0 / -0 (1 online) | entraram: | saíram:  ***\n"
+).encode(ENCODING)
+
+
+class CompressionStats:
+    """Totais de bytes e de tempo de CPU gastos com compressão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def add(self, raw_bytes, compressed_bytes, cpu_seconds=0.0):
+        """Acumula o resultado de uma compressão."""
+        with self._lock:
+            self.raw_bytes += raw_bytes
+            self.compressed_bytes += compressed_bytes
+            self.cpu_seconds += cpu_seconds
+
+    def summary(self):
+        """Retorna um resumo legível com a taxa de compressão e o custo de CPU."""
+        with self._lock:
+            ratio = self.compressed_bytes / self.raw_bytes if self.raw_bytes else 1.0
+            return (
+                f"{self.raw_bytes} -> {self.compressed_bytes} bytes "
+                f"({ratio:.1%}), {self.cpu_seconds * 1000:.1f} ms de CPU"
+            )
+
+
+# Totais de todas as conexões comprimidas do servidor
+server_stats = CompressionStats()
+
+
+def _new_compressor(use_dict):
+    if use_dict:
+        return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, WBITS, zdict=PRESET_DICTIONARY)
+    return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, WBITS)
+
+
+def _new_decompressor(use_dict):
+    if use_dict:
+        return zlib.decompressobj(WBITS, zdict=PRESET_DICTIONARY)
+    return zlib.decompressobj(WBITS)
+
+
+class SharedPayload:
+    """
+    Mensagem destinada a vários clientes, comprimida no máximo uma vez por modo.
+
+    O quadro é gerado na primeira conexão que precisa dele e reaproveitado
+    pelas demais, em vez de comprimir a mesma mensagem para cada destinatário.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._frames = {}
+
+    def frame(self, use_dict):
+        """Retorna o quadro FRAME_SHARED (ou FRAME_RAW) para o modo informado."""
+        frame = self._frames.get(use_dict)
+        if frame is None:
+            started = time.thread_time()
+            compressor = _new_compressor(use_dict)
+            data = compressor.compress(self.payload) + compressor.flush(zlib.Z_FINISH)
+            cpu = time.thread_time() - started
+            if len(data) < len(self.payload):
+                frame = FRAME_HEADER.pack(FRAME_SHARED, len(data)) + data
+            else:
+                frame = FRAME_HEADER.pack(FRAME_RAW, len(self.payload)) + self.payload
+            server_stats.add(0, 0, cpu)
+            self._frames[use_dict] = frame
+        return frame
+
+
+class CompressedConnection:
+    """
+    Envolve um socket SSL do servidor, comprimindo tudo o que é enviado por ele.
+
+    Cada conexão mantém seu próprio contexto deflate, de modo que mensagens
+    parecidas em sequência são comprimidas com referência às anteriores.
+    Os demais atributos (recv, close, ...) são repassados ao socket original.
+
+    Transmissões usam `enqueue` + `flush`: a mensagem é enfileirada com o lock do
+    servidor adquirido (sem compressão nem E/S) e comprimida e enviada depois,
+    fora dele, preservando a ordem de enfileiramento.
+    """
+
+    def __init__(self, sock, use_dict):
+        self._sock = sock
+        self.use_dict = use_dict
+        self._compressor = _new_compressor(use_dict)
+        self._send_lock = threading.Lock()  # Envios de threads diferentes não podem se intercalar
+        self._pending = deque()  # Mensagens (bytes ou SharedPayload) ainda não enviadas
+        self.stats = CompressionStats()
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def send(self, data):
+        """Comprime `data` no contexto da conexão e o envia como um quadro, após as mensagens enfileiradas."""
+        with self._send_lock:
+            self._send_pending()
+            self._send_stream(data)
+        return len(data)
+
+    sendall = send
+
+    def enqueue(self, message):
+        """Enfileira uma mensagem (bytes ou SharedPayload) para o próximo `flush`."""
+        self._pending.append(message)
+
+    def flush(self):
+        """Comprime e envia as mensagens enfileiradas, na ordem em que chegaram."""
+        with self._send_lock:
+            self._send_pending()
+
+    def _send_pending(self):
+        while self._pending:
+            message = self._pending.popleft()
+            if isinstance(message, SharedPayload):
+                self._send_shared(message)
+            else:
+                self._send_stream(message)
+
+    def _send_stream(self, data):
+        started = time.thread_time()
+        compressed = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        cpu = time.thread_time() - started
+        frame = FRAME_HEADER.pack(FRAME_STREAM, len(compressed)) + compressed
+        self._sock.sendall(frame)
+        self.stats.add(len(data), len(frame), cpu)
+        server_stats.add(len(data), len(frame), cpu)
+
+    def _send_shared(self, shared):
+        frame = shared.frame(self.use_dict)
+        self._sock.sendall(frame)
+        self.stats.add(len(shared.payload), len(frame))
+        server_stats.add(len(shared.payload), len(frame))
+
+
+def wrap_connection(sock):
+    """
+    Aplica o modo de compressão negociado via ALPN a um socket SSL já conectado.
+
+    Returns:
+        O próprio socket, se nenhuma compressão foi negociada, ou um CompressedConnection
+    """
+    protocol = sock.selected_alpn_protocol()
+    if protocol == PROTOCOL_DEFLATE_DICT:
+        return CompressedConnection(sock, use_dict=True)
+    if protocol == PROTOCOL_DEFLATE:
+        return CompressedConnection(sock, use_dict=False)
+    return sock
+
+
+class FrameDecoder:
+    """
+    Remonta e descomprime os quadros recebidos pelo cliente.
+
+    Aceita dados em pedaços arbitrários; quadros incompletos ficam guardados
+    até a chegada do restante.
+    """
+
+    def __init__(self, use_dict):
+        self.use_dict = use_dict
+        self._stream = _new_decompressor(use_dict)
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Processa os bytes recebidos e retorna o texto descomprimido disponível (bytes)."""
+        self._buffer += data
+        output = []
+        offset = 0
+        while len(self._buffer) - offset >= FRAME_HEADER.size:
+            kind, length = FRAME_HEADER.unpack_from(self._buffer, offset)
+            start = offset + FRAME_HEADER.size
+            if len(self._buffer) - start < length:
+                break
+            body = bytes(self._buffer[start : start + length])
+            if kind == FRAME_STREAM:
+                output.append(self._stream.decompress(body))
+            elif kind == FRAME_SHARED:
+                output.append(_new_decompressor(self.use_dict).decompress(body))
+            elif kind == FRAME_RAW:
+                output.append(body)
+            else:
+                raise ValueError(f"Tipo de quadro desconhecido: {kind}")
+            offset = start + length
+        del self._buffer[:offset]
+        return b"".join(output)
@@ -1,5 +1,6 @@
 import sqlite3
 import hashlib
+import sys
 
 DB_NAME = "chat.db"
 ENCODING = "utf-8"
@@ -17,6 +18,9 @@ def init_db():
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
 
+    # Modo WAL: leituras do servidor não ficam bloqueadas durante cargas em lote
+    cursor.execute("PRAGMA journal_mode=WAL")
+
     # Tabela de usuários
     cursor.execute(
         """
@@ -65,6 +69,32 @@ def add_user(username, password):
         conn.close()
 
 
+def connect_bulk():
+    """
+    Abre uma conexão para cargas em lote que convive com um servidor em execução.
+
+    Usa o modo WAL (leituras concorrentes não são bloqueadas) e espera pelo
+    bloqueio de escrita em vez de falhar imediatamente.
+    """
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def add_users_bulk(conn, rows):
+    """
+    Insere vários usuários em uma única transação.
+    Recebe tuplas (usuário, hash_da_senha) já com o hash calculado.
+    Usuários já existentes são ignorados. Retorna quantos usuários foram inseridos.
+    """
+    with conn:
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)", rows
+        )
+    return cursor.rowcount
+
+
 def get_user_hash(username):
     """
     Busca o hash da senha de um usuário no banco de dados.
@@ -110,6 +140,20 @@ def create_room(name, password=None):
         conn.close()
 
 
+def create_rooms_bulk(conn, rows):
+    """
+    Cria várias salas em uma única transação.
+    Recebe tuplas (nome_da_sala, hash_da_senha_ou_None); salas com senha são privadas.
+    Salas já existentes são ignoradas. Retorna quantas salas foram criadas.
+    """
+    with conn:
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO rooms (name, is_private, password_hash) VALUES (?, ?, ?)",
+            [(name, password_h is not None, password_h) for name, password_h in rows],
+        )
+    return cursor.rowcount
+
+
 def get_rooms():
     """
     Retorna uma lista de tuplas (nome_da_sala, é_privada).
@@ -122,6 +166,68 @@ def get_rooms():
     return rooms
 
 
+def _prefix_upper_bound(prefix):
+    """
+    Retorna o menor texto maior que todos os textos que começam com `prefix`.
+
+    Pula a faixa de surrogates (inválida em UTF-8) e descarta um último caractere
+    que já seja o máximo (U+10FFFF). Retorna None quando não há limite superior.
+    """
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if 0xD800 <= code <= 0xDFFF:
+            code = 0xE000
+        if code <= sys.maxunicode:
+            return prefix[:-1] + chr(code)
+        prefix = prefix[:-1]
+    return None
+
+
+def search_rooms(prefix="", limit=20, offset=0):
+    """
+    Retorna uma página de tuplas (nome_da_sala, é_privada) em ordem alfabética.
+
+    A busca por prefixo usa um intervalo sobre o índice único de `name`
+    (name >= prefixo AND name < limite), evitando varrer toda a tabela.
+    """
+    query = "SELECT name, is_private FROM rooms"
+    params = []
+    if prefix:
+        query += " WHERE name >= ?"
+        params.append(prefix)
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            query += " AND name < ?"
+            params.append(upper)
+    query += " ORDER BY name LIMIT ? OFFSET ?"
+    params += [limit, offset]
+
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rooms = cursor.fetchall()
+    conn.close()
+    return rooms
+
+
+def get_rooms_privacy(names):
+    """
+    Retorna um dicionário {nome_da_sala: é_privada} para as salas informadas.
+    """
+    names = list(names)
+    if not names:
+        return {}
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT name, is_private FROM rooms WHERE name IN ({', '.join('?' * len(names))})",
+        names,
+    )
+    privacy = dict(cursor.fetchall())
+    conn.close()
+    return privacy
+
+
 def get_room_details(name):
     """
 
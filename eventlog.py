@@ -0,0 +1,303 @@
+"""
+Log binário de eventos do servidor de chat, para análises offline.
+
+Formato de cada segmento:
+- Cabeçalho de 8 bytes (SEGMENT_MAGIC)
+- Sequência de registros [tamanho:u32][tipo:u8][horário:f64][campos...], em little-endian,
+  onde `tamanho` conta os bytes após ele próprio. Textos são gravados como [u16][UTF-8].
+
+A gravação é feita por uma thread separada: o servidor apenas enfileira os eventos,
+que são codificados e escritos em lotes. Os segmentos são trocados ao atingir
+SEGMENT_SIZE bytes e nomeados pelo horário de criação, de modo que a ordem
+alfabética é a ordem cronológica.
+
+O leitor usa mmap e pode filtrar pelo tipo antes de decodificar os campos.
+Para um resumo por sala e por usuário:
+    python eventlog.py eventlog/
+"""
+
+import argparse
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+
+ENCODING = "utf-8"
+SEGMENT_MAGIC = b"CHATEVT1"
+SEGMENT_SIZE = 64 * 1024 * 1024  # Tamanho máximo (bytes) de cada segmento
+FLUSH_INTERVAL = 1.0             # Intervalo máximo (s) até os eventos chegarem ao disco
+WRITE_BUFFER = 1024 * 1024       # Buffer de escrita do arquivo
+
+# Tipos de evento
+LOGIN = 1       # usuário, sucesso (0/1)
+JOIN = 2        # usuário, sala
+LEAVE = 3       # usuário, sala
+MESSAGE = 4     # usuário, sala, tamanho da mensagem em bytes, número de destinatários
+DISCONNECT = 5  # usuário ("" se não autenticado)
+
+# Formato dos campos de cada tipo: "s" = texto, demais = código do módulo struct
+EVENT_SCHEMAS = {
+    LOGIN: "sB",
+    JOIN: "ss",
+    LEAVE: "ss",
+    MESSAGE: "ssII",
+    DISCONNECT: "s",
+}
+EVENT_NAMES = {
+    LOGIN: "login",
+    JOIN: "join",
+    LEAVE: "leave",
+    MESSAGE: "message",
+    DISCONNECT: "disconnect",
+}
+
+_LENGTH = struct.Struct("<I")
+_HEADER = struct.Struct("<IBd")
+_STRING_LENGTH = struct.Struct("<H")
+_NUMBERS = {code: struct.Struct("<" + code) for code in "BI"}
+
+Event = namedtuple("Event", "kind timestamp fields")
+
+
+def encode_event(kind, timestamp, fields):
+    """Codifica um evento como um registro binário completo."""
+    parts = []
+    for code, value in zip(EVENT_SCHEMAS[kind], fields):
+        if code == "s":
+            data = value.encode(ENCODING)
+            if len(data) > 0xFFFF:
+                # Corta em um limite de caractere para o texto continuar sendo UTF-8 válido
+                data = data[:0xFFFF].decode(ENCODING, "ignore").encode(ENCODING)
+            parts.append(_STRING_LENGTH.pack(len(data)))
+            parts.append(data)
+        else:
+            parts.append(_NUMBERS[code].pack(value))
+    body = b"".join(parts)
+    return _HEADER.pack(_HEADER.size - _LENGTH.size + len(body), kind, timestamp) + body
+
+
+def _decode_fields(kind, buffer, offset):
+    fields = []
+    for code in EVENT_SCHEMAS[kind]:
+        if code == "s":
+            (length,) = _STRING_LENGTH.unpack_from(buffer, offset)
+            offset += _STRING_LENGTH.size
+            fields.append(str(buffer[offset : offset + length], ENCODING, "replace"))
+            offset += length
+        else:
+            number = _NUMBERS[code]
+            fields.append(number.unpack_from(buffer, offset)[0])
+            offset += number.size
+    return tuple(fields)
+
+
+class EventLog:
+    """
+    Gravador assíncrono do log de eventos.
+
+    `record` apenas enfileira o evento, sem E/S nem codificação, e pode ser
+    chamado de qualquer thread, inclusive com o lock do servidor adquirido.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, kind, *fields):
+        """Enfileira um evento com o horário atual."""
+        self._queue.put((kind, time.time(), fields))
+
+    def close(self):
+        """Grava os eventos pendentes e fecha o segmento atual."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open_segment(self):
+        if self._file:
+            self._file.close()
+        name = f"events-{time.time_ns() // 1000:016d}-{os.getpid()}.log"
+        self._file = open(os.path.join(self.directory, name), "ab", buffering=WRITE_BUFFER)
+        self._file.write(SEGMENT_MAGIC)
+        self._written = len(SEGMENT_MAGIC)
+
+    def _write(self, item):
+        try:
+            record = encode_event(*item)
+        except (KeyError, TypeError, AttributeError, struct.error) as e:
+            print(f"[ERRO] Evento inválido descartado do log de eventos {item!r}: {e}")
+            return
+        if self._file is None or self._written + len(record) > self.segment_size:
+            self._open_segment()
+        self._file.write(record)
+        self._written += len(record)
+
+    def _run(self):
+        """Loop da thread de gravação: agrupa os eventos e descarrega a cada FLUSH_INTERVAL."""
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = ()
+            # Esvazia a fila de uma vez antes de descarregar o arquivo
+            try:
+                while item is not None:
+                    if item:
+                        self._write(item)
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if self._file:
+                    self._file.flush()
+            except OSError as e:
+                # Falha de disco: a thread continua consumindo a fila e tenta de novo no próximo lote
+                print(f"[ERRO] Falha ao gravar o log de eventos: {e}")
+            if item is None:
+                if self._file:
+                    self._file.close()
+                return
+
+
+def segment_paths(path):
+    """Retorna os segmentos de um diretório (em ordem cronológica) ou o próprio arquivo."""
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, name)
+            for name in sorted(os.listdir(path))
+            if name.startswith("events-") and name.endswith(".log")
+        ]
+    return [path]
+
+
+def iter_segment(path, kinds=None):
+    """
+    Percorre os eventos de um segmento usando mmap.
+
+    Args:
+        path (str): Arquivo do segmento
+        kinds (set, opcional): Tipos de evento desejados; os demais são pulados
+            sem decodificar os campos; tipos desconhecidos são sempre pulados
+
+    Yields:
+        Event: (tipo, horário, campos)
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(SEGMENT_MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[: len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                raise ValueError(f"Arquivo não é um segmento do log de eventos: {path}")
+            offset = len(SEGMENT_MAGIC)
+            end = len(buffer)
+            while offset + _HEADER.size <= end:
+                length, kind, timestamp = _HEADER.unpack_from(buffer, offset)
+                next_offset = offset + _LENGTH.size + length
+                if next_offset > end:
+                    break  # Registro incompleto no fim do segmento (gravação em andamento)
+                # Tipos desconhecidos (gravados por uma versão mais nova) são pulados pelo tamanho
+                if kind in EVENT_SCHEMAS and (kinds is None or kind in kinds):
+                    yield Event(kind, timestamp, _decode_fields(kind, buffer, offset + _HEADER.size))
+                offset = next_offset
+
+
+def iter_events(path, kinds=None):
+    """Percorre os eventos de um arquivo ou de todos os segmentos de um diretório."""
+    for segment in segment_paths(path):
+        yield from iter_segment(segment, kinds)
+
+
+def summarize(path):
+    """
+    Agrega os eventos para análise de tráfego por sala, rotatividade e falhas de login.
+
+    Returns:
+        dict: Contadores por sala e por usuário
+    """
+    summary = {
+        "events": 0,
+        "messages": Counter(),
+        "message_bytes": Counter(),
+        "deliveries": Counter(),
+        "joins": Counter(),
+        "leaves": Counter(),
+        "login_failures": Counter(),
+        "logins": 0,
+        "disconnects": 0,
+        "first": None,
+        "last": None,
+    }
+    for kind, timestamp, fields in iter_events(path):
+        summary["events"] += 1
+        if summary["first"] is None:
+            summary["first"] = timestamp
+        summary["last"] = timestamp
+        if kind == MESSAGE:
+            _, room, size, recipients = fields
+            summary["messages"][room] += 1
+            summary["message_bytes"][room] += size
+            summary["deliveries"][room] += recipients
+        elif kind == JOIN:
+            summary["joins"][fields[1]] += 1
+        elif kind == LEAVE:
+            summary["leaves"][fields[1]] += 1
+        elif kind == LOGIN:
+            if fields[1]:
+                summary["logins"] += 1
+            else:
+                summary["login_failures"][fields[0]] += 1
+        elif kind == DISCONNECT:
+            summary["disconnects"] += 1
+    return summary
+
+
+def main():
+    """Exibe um resumo dos eventos de um arquivo ou diretório de segmentos."""
+    parser = argparse.ArgumentParser(description="Resumo do log de eventos do chat.")
+    parser.add_argument("path", help="segmento ou diretório de segmentos")
+    parser.add_argument("--top", type=int, default=10, help="número de salas e usuários exibidos")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        summary = summarize(args.path)
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] Não foi possível ler o log de eventos: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    print(f"[INFO] {summary['events']} eventos lidos em {elapsed:.2f}s")
+    if summary["first"] is not None:
+        print(
+            f"Período: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['first']))} a "
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['last']))}"
+        )
+    print(f"Logins: {summary['logins']} | Desconexões: {summary['disconnects']}")
+
+    print("\n--- SALAS MAIS MOVIMENTADAS ---")
+    for room, count in summary["messages"].most_common(args.top):
+        print(
+            f"- {room}: {count} mensagens, {summary['message_bytes'][room]} bytes, "
+            f"{summary['deliveries'][room]} entregas"
+        )
+
+    print("\n--- ROTATIVIDADE (ENTRADAS / SAÍDAS) ---")
+    for room, count in (summary["joins"] + summary["leaves"]).most_common(args.top):
+        print(f"- {room}: +{summary['joins'][room]} / -{summary['leaves'][room]}")
+
+    print("\n--- FALHAS DE LOGIN ---")
+    for user, count in summary["login_failures"].most_common(args.top):
+        print(f"- {user}: {count}")
+
+
+if __name__ == "__main__":
+    main()
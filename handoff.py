@@ -0,0 +1,120 @@
+"""
+Transferência do socket de escuta e do estado do servidor entre processos.
+
+Usado no reinício sem interrupção: o processo novo se conecta ao socket de
+controle (Unix) do processo antigo, recebe dele o descritor do socket de escuta
+(via SCM_RIGHTS), confirma o recebimento e, ao final da drenagem, recebe um
+resumo do estado das salas em JSON. Sem a confirmação, o processo antigo
+continua atendendo normalmente.
+Disponível apenas em sistemas com sockets Unix e `sendmsg` (Linux, macOS).
+"""
+
+import array
+import json
+import os
+import socket
+import struct
+
+HANDOFF_PATH = "chat_handoff.sock"  # Caminho padrão do socket de controle
+ENCODING = "utf-8"
+ACK = b"A"  # Confirmação de que o novo processo recebeu o socket de escuta
+
+_LENGTH = struct.Struct("!I")
+
+
+def is_supported():
+    """Indica se o sistema permite transferir descritores entre processos."""
+    return hasattr(socket, "AF_UNIX") and hasattr(socket.socket, "sendmsg")
+
+
+def listen(path=HANDOFF_PATH):
+    """
+    Cria o socket de controle que aguarda pedidos de transferência.
+
+    Um arquivo de socket antigo no mesmo caminho é removido antes.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    control.bind(path)
+    control.listen(1)
+    return control
+
+
+def send_listener(conn, listener):
+    """Envia o descritor do socket de escuta pela conexão de controle."""
+    fds = array.array("i", [listener.fileno()])
+    conn.sendmsg([b"L"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+
+
+def wait_ack(conn, timeout):
+    """
+    Aguarda a confirmação de que o novo processo recebeu o socket de escuta.
+
+    Raises:
+        OSError: Se a conexão de controle falhar ou o prazo se esgotar
+        RuntimeError: Se a conexão for encerrada sem confirmação
+    """
+    conn.settimeout(timeout)
+    try:
+        data = conn.recv(len(ACK))
+    finally:
+        conn.settimeout(None)
+    if data != ACK:
+        raise RuntimeError("O novo processo não confirmou o recebimento do socket de escuta.")
+
+
+def request_takeover(path=HANDOFF_PATH):
+    """
+    Pede ao processo em execução o socket de escuta.
+
+    Returns:
+        tuple: (socket de escuta recebido, conexão de controle para receber o estado)
+
+    Raises:
+        OSError: Se não houver processo aguardando no caminho informado
+        RuntimeError: Se nenhum descritor for recebido
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(path)
+
+    fds = array.array("i")
+    _, ancdata, _, _ = conn.recvmsg(1, socket.CMSG_SPACE(fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+    if not fds:
+        conn.close()
+        raise RuntimeError("Nenhum socket de escuta recebido do processo antigo.")
+    listener = socket.socket(fileno=fds[0])
+    try:
+        conn.sendall(ACK)
+    except OSError:
+        listener.close()
+        conn.close()
+        raise
+    return listener, conn
+
+
+def send_state(conn, state):
+    """Envia o estado serializado em JSON, precedido do seu tamanho."""
+    data = json.dumps(state).encode(ENCODING)
+    conn.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(conn, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Conexão de controle encerrada antes do fim do estado.")
+        data += chunk
+    return bytes(data)
+
+
+def receive_state(conn):
+    """Recebe o estado enviado por `send_state`."""
+    (length,) = _LENGTH.unpack(_recv_exactly(conn, _LENGTH.size))
+    return json.loads(_recv_exactly(conn, length).decode(ENCODING))
@@ -0,0 +1,217 @@
+"""
+Ferramenta de cadastro em lote de usuários e salas.
+
+Lê usuários ou salas de um arquivo CSV ou JSONL e os grava no banco de dados
+do chat sem passar pelos menus interativos do servidor:
+- Leitura em fluxo (o arquivo nunca é carregado inteiro na memória)
+- Hash das senhas distribuído em um pool de processos
+- Inserções com `executemany` em transações grandes
+- Relatório de linhas/s, duplicadas e inválidas
+
+Pode ser executada com o servidor no ar: o banco usa o modo WAL, então as leituras
+do servidor não são bloqueadas, e cada transação é curta o bastante para não
+atrasar cadastros feitos pelo servidor.
+
+Formato dos arquivos:
+- CSV com cabeçalho: `username,password` (usuários) ou `name,password` (salas; senha vazia = pública)
+- JSONL: `{"username": ..., "password": ...}` ou `{"name": ..., "password": ...}`
+
+Exemplo:
+    python provision.py users usuarios.csv
+    python provision.py rooms salas.jsonl --batch-size 10000 --workers 4
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+
+ENCODING = "utf-8"
+BATCH_SIZE = 5000       # Linhas por transação
+REPORT_EVERY = 20       # Exibe o progresso a cada N lotes
+NICE_INCREMENT = 10     # Reduz a prioridade da carga para não competir com o servidor
+
+# Campo de nome de cada tipo de registro
+NAME_FIELDS = {"users": "username", "rooms": "name"}
+
+
+def _lower_priority():
+    """Reduz a prioridade de CPU do processo atual, quando suportado."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(NICE_INCREMENT)
+        except OSError:
+            pass
+
+
+def _hash_all(passwords):
+    """Calcula o hash de uma lista de senhas (None permanece None). Executada nos processos do pool."""
+    return [database.hash_password(p) if p is not None else None for p in passwords]
+
+
+def read_records(path, kind, file_format=None):
+    """
+    Lê os registros de um arquivo CSV ou JSONL em fluxo.
+
+    Yields:
+        tuple: (nome, senha) — a senha é None quando ausente ou vazia;
+        (None, None) para linhas inválidas
+    """
+    name_field = NAME_FIELDS[kind]
+    if file_format is None:
+        file_format = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+    with open(path, newline="", encoding=ENCODING) as f:
+        if file_format == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (_parse_json_line(line) for line in f if line.strip())
+
+        for record in records:
+            name = record.get(name_field) if isinstance(record, dict) else None
+            password = record.get("password") if isinstance(record, dict) else None
+            if not isinstance(name, str) or not isinstance(password, (str, type(None))):
+                yield None, None
+                continue
+            name = name.strip()
+            password = password or None
+            # Nomes com espaço não funcionam nos menus do servidor
+            if not name or " " in name or (kind == "users" and password is None):
+                yield None, None
+            else:
+                yield name, password
+
+
+def _parse_json_line(line):
+    """Interpreta uma linha JSONL; retorna None se ela não for um JSON válido."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def provision(path, kind, file_format=None, batch_size=BATCH_SIZE, workers=None):
+    """
+    Carrega usuários ou salas de um arquivo para o banco de dados.
+
+    Os hashes de vários lotes são calculados em paralelo pelo pool enquanto os
+    lotes já prontos são inseridos, na ordem do arquivo.
+
+    Returns:
+        dict: Contadores `read`, `inserted`, `duplicates`, `invalid` e `seconds`
+    """
+    insert = database.add_users_bulk if kind == "users" else database.create_rooms_bulk
+    counts = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+    started = time.perf_counter()
+
+    workers = workers or os.cpu_count() or 1
+    database.init_db()
+    conn = database.connect_bulk()
+    # Os processos do pool herdam a prioridade reduzida do processo principal
+    pool = ProcessPoolExecutor(max_workers=workers)
+    max_in_flight = workers + 1
+    in_flight = deque()
+
+    def flush_oldest():
+        names, future = in_flight.popleft()
+        inserted = insert(conn, list(zip(names, future.result())))
+        counts["inserted"] += inserted
+        counts["duplicates"] += len(names) - inserted
+
+    try:
+        for number, batch in enumerate(_batches(read_records(path, kind, file_format), batch_size), 1):
+            valid = [record for record in batch if record[0] is not None]
+            counts["read"] += len(batch)
+            counts["invalid"] += len(batch) - len(valid)
+            names = [name for name, _ in valid]
+            in_flight.append((names, pool.submit(_hash_all, [pwd for _, pwd in valid])))
+
+            if len(in_flight) >= max_in_flight:
+                flush_oldest()
+            if number % REPORT_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[INFO] {counts['read']} linhas lidas ({counts['read'] / elapsed:.0f} linhas/s)",
+                    file=sys.stderr,
+                )
+
+        while in_flight:
+            flush_oldest()
+    finally:
+        pool.shutdown()
+        conn.close()
+
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+
+def _positive_int(value):
+    """Tipo do argparse para inteiros maiores que zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inteiro inválido: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {number}")
+    return number
+
+
+def parse_args(argv=None):
+    """Interpreta os argumentos de linha de comando da ferramenta."""
+    parser = argparse.ArgumentParser(description="Cadastro em lote de usuários e salas do chat.")
+    parser.add_argument("kind", choices=sorted(NAME_FIELDS), help="tipo de registro")
+    parser.add_argument("path", help="arquivo CSV ou JSONL")
+    parser.add_argument(
+        "--format", choices=["csv", "jsonl"], help="formato do arquivo (padrão: pela extensão)"
+    )
+    parser.add_argument("--db", default=database.DB_NAME, help="arquivo do banco de dados")
+    parser.add_argument(
+        "--batch-size", type=_positive_int, default=BATCH_SIZE, help="linhas por transação"
+    )
+    parser.add_argument(
+        "--workers", type=_positive_int, help="processos para o hash das senhas (padrão: número de CPUs)"
+    )
+    return parser.parse_args(argv)
+
+
+def main():
+    """Executa a carga e exibe o relatório final."""
+    args = parse_args()
+    database.DB_NAME = args.db
+    _lower_priority()
+
+    try:
+        counts = provision(args.path, args.kind, args.format, args.batch_size, args.workers)
+    except FileNotFoundError as e:
+        print(f"[ERRO] Arquivo não encontrado: {e}")
+        sys.exit(1)
+    except (ValueError, csv.Error) as e:
+        print(f"[ERRO] Arquivo inválido: {e}")
+        sys.exit(1)
+
+    rate = counts["read"] / counts["seconds"] if counts["seconds"] else 0
+    print(
+        f"[INFO] {args.kind}: {counts['read']} linhas lidas, {counts['inserted']} inseridas, "
+        f"{counts['duplicates']} duplicadas, {counts['invalid']} inválidas "
+        f"em {counts['seconds']:.2f}s ({rate:.0f} linhas/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()